@@ -2,6 +2,8 @@ import pickle
 import os
 import argparse
 
+import orjson
+
 from src.scraper import PageScraper
 from src.utils.adminlink import string_filter
 
@@ -20,10 +22,19 @@ def crawly_go_crawl(args):
         verbose=args.verbose, 
         filter_function=args.filter_function, 
         filter_string=args.filter_string, 
+        store_filetypes=args.store_filetypes,
     )
 
-    with open(os.path.join(args.write_dir, '_overview', 'scraper_class.pkl'), 'wb') as con:
-        pickle.dump(scraper, con)
+    # with --no-write the crawl does not create the file structure
+    overview_dir = os.path.join(args.write_dir, '_overview')
+    os.makedirs(overview_dir, exist_ok=True)
+
+    if args.format == 'pickle':
+        with open(os.path.join(overview_dir, 'scraper_class.pkl'), 'wb', buffering=1 << 20) as con:
+            pickle.dump(scraper, con, protocol=pickle.HIGHEST_PROTOCOL)
+    else:
+        with open(os.path.join(overview_dir, 'scraper_class.json'), 'wb', buffering=1 << 20) as con:
+            con.write(orjson.dumps(scraper.to_dict()))
 
 
 if __name__ == "__main__":
@@ -37,10 +48,10 @@ if __name__ == "__main__":
                         type=str, 
                         default='./crawled_data')
     parser.add_argument("--write",
-                        type=bool,
+                        action=argparse.BooleanOptionalAction,
                         default=True)
     parser.add_argument('--verbose',
-                        type=bool,
+                        action=argparse.BooleanOptionalAction,
                         default=True)
     parser.add_argument('--filter_function',
                         type=string_filter,
@@ -48,6 +59,14 @@ if __name__ == "__main__":
     parser.add_argument('--filter_string',
                         type=str,
                         default='astra/de|classified-compilation|fedlex')
+    parser.add_argument('--store_filetypes',
+                        type=str,
+                        nargs='+',
+                        default=None)
+    parser.add_argument('--format',
+                        type=str,
+                        choices=['json', 'pickle'],
+                        default='json')
 
 
     args = parser.parse_args()
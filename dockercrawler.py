@@ -1,6 +1,6 @@
 import pickle
-import os
 import argparse
+from pathlib import Path
 
 from src.scraper import PageScraper, FedlexScraper
 from src.utils.adminlink import string_filter
@@ -16,10 +16,11 @@ if __name__ == "__main__":
         filter_string='astra/de|classified-compilation|fedlex', 
     )
 
-    os.mkdir('./crawled_data/fedlex')
+    fedlex_dir = Path('./crawled_data/fedlex')
+    fedlex_dir.mkdir(parents=True, exist_ok=True)
     scraper_fedlex = FedlexScraper()
-    scraper_fedlex._scrap_feldex(write_dir='./crawled_data/fedlex', 
+    scraper_fedlex._scrap_feldex(write_dir=str(fedlex_dir), 
                                  reset_counter=0)
 
-    with open('./crawled_data/fedlex/_overview_fedlex.pkl', 'wb') as con:
-        pickle.dump(scraper_fedlex.crawled_legal_knowledge, con)
\ No newline at end of file
+    with open(fedlex_dir / '_overview_fedlex.pkl', 'wb', buffering=1 << 20) as con:
+        pickle.dump(scraper_fedlex.crawled_legal_knowledge, con, protocol=pickle.HIGHEST_PROTOCOL)
\ No newline at end of file
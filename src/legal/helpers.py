@@ -1,10 +1,63 @@
 """
 Helper module for webpages that contain javascript
 """
+import asyncio
+import functools
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
 import re
+from urllib.parse import urljoin
+
+import httpx
+import lxml.html
+from lxml import etree
 from selenium import webdriver
 from selenium.webdriver import Chrome
+from selenium.common import NoSuchElementException, TimeoutException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+_LOGGER = logging.getLogger('scraper')
+
+# one FedlexDriver per process, started lazily and reused across urls, the pid
+# tells forked workers apart from the process that started the inherited driver
+_DRIVER = None
+_DRIVER_PID = None
+
+# pages that cannot be resolved from the plain html are rendered with selenium,
+# set to False to skip those pages instead of starting browsers
+USE_BROWSER_FALLBACK = True
+
+_TWO_DIGITS_RE = re.compile(r'\d{2}')
+
+# compiled once, the xpath equivalents of the css selectors used with selenium
+_XP_INFORCE_TEXT = etree.XPath('string(//app-in-force-status)')
+_XP_WELL_WHITE = etree.XPath("//div[contains(@class, 'well well-white')]")
+_XP_ACTIVE = etree.XPath(".//span[contains(@class, 'soft-green')]")
+_XP_TD = etree.XPath('.//td')
+_XP_A_HREF = etree.XPath('.//a[@href]')
+_XP_H4 = etree.XPath('.//h4')
+
+# [text, href of the link labelled XML or null] for every cell below arguments[0]
+_GRAB_CELLS_JS = """
+return Array.from(arguments[0].querySelectorAll('td'), function (cell) {
+    var href = null;
+    cell.querySelectorAll('a[href]').forEach(function (link) {
+        if (link.innerText.trim() === 'XML') { href = link.href; }
+    });
+    return [cell.innerText.trim(), href];
+});
+"""
+
+@functools.lru_cache(maxsize=None)
+def _css_locator(css_element):
+    """
+    Memoized (By.CSS_SELECTOR, selector) locator for the selenium calls.
+    """
+    return By.CSS_SELECTOR, css_element
 
 def isolate_css_selector(web_element, css_element='h4', logical=False):
     """
@@ -16,30 +69,29 @@ def isolate_css_selector(web_element, css_element='h4', logical=False):
     logical (bool): If True, returns True if at least one element is found, otherwise False (default is False).
 
     Returns:
-    str or bool: Text content of the matched element if found and logical is False. 
-    True if element(s) found and logical is True, otherwise False.
-    """
-    for element in web_element.find_elements(By.CSS_SELECTOR, css_element):
-        try:
-            key_title = element.text
-            pass_part = True
-        except:
-            pass_part = False
-
-    if pass_part and not logical:
-        return key_title
-    elif logical:
-        return pass_part
+    str or bool: Text content of the first matched element if logical is False, 
+    None if nothing matched. True if element(s) found and logical is True, otherwise False.
+    """
+    elements = web_element.find_elements(*_css_locator(css_element))
+    if logical:
+        return bool(elements)
+    # only the first match is read, every .text is a round-trip to the browser
+    return elements[0].text if elements else None
     
+def _legal_status(status_text):
+    """
+    Map the text of the in-force status bar to a legal status.
+    """
+    if 'Dieser Text ist nicht in Kraft' in status_text:
+        return 'not_in_force'
+    elif 'Dieser Text ist in Kraft' in status_text:
+        return 'in_force'
+    return 'unknown'
+
 def detect_inforce(driver):
-    status_bar = driver.find_element(By.CSS_SELECTOR, "app-in-force-status")
-    if 'Dieser Text ist nicht in Kraft' in status_bar.text:
-        legal_status = 'not_in_force'
-    elif 'Dieser Text ist in Kraft' in status_bar.text:
-        legal_status = 'in_force'
-    else:
-        legal_status = 'unknown'
-    return legal_status
+    # read the text once, each .text is a round-trip to the browser
+    status_text = driver.find_element(*_css_locator("app-in-force-status")).text
+    return _legal_status(status_text)
 
 def get_parent(element, level=1):
     """
@@ -52,12 +104,8 @@ def get_parent(element, level=1):
     Returns:
     WebElement: The parent element at the specified level.
     """
-    tmp = element
-    for parent_level in range(level):
-        parent = tmp.find_element(By.XPATH,'./..')
-        tmp = parent
-
-    return parent
+    # a single compound xpath, every find_element is a round-trip to the browser
+    return element.find_element(By.XPATH, './' + '/'.join(['..'] * level))
 
 def grab_xml_link(parent_element):
     """
@@ -66,18 +114,19 @@ def grab_xml_link(parent_element):
     Parameters:
     parent_element (WebElement): The parent element containing XML link and publication date.
 
-    Returns:a
-    tuple: A tuple containing the XML link and publication date.
+    Returns:
+    tuple: A tuple containing the XML link and publication date, None for
+    the ones that were not found.
     """
-    for data_element in parent_element.find_elements(By.CSS_SELECTOR, 'td'):
-        if re.compile('\d{2}').search(data_element.accessible_name):
-            publication_date = data_element.accessible_name
-        if 'XML' in data_element.accessible_name:
-            # get container
-            # now loop through linebreaks
-            for link_element in data_element.find_elements(By.CSS_SELECTOR, 'a[href]'):
-                if link_element.accessible_name == 'XML':
-                    link_xml = link_element.get_attribute('href')
+    # one script call returns the text and XML href of every cell, instead of
+    # several browser round-trips per cell and link
+    cells = parent_element.parent.execute_script(_GRAB_CELLS_JS, parent_element)
+    link_xml, publication_date = None, None
+    for name, href in cells:
+        if _TWO_DIGITS_RE.search(name):
+            publication_date = name
+        if 'XML' in name and href is not None:
+            link_xml = href
 
     return link_xml, publication_date
 
@@ -91,16 +140,17 @@ def get_xml_link(driver, date=True):
 
     Returns:
     tuple or str: A tuple containing the XML link and publication date if date is True,
-    otherwise just the XML link.
+    otherwise just the XML link. The link is None if the sidebars are not rendered.
     """
-    sidebars = driver.find_elements(By.CSS_SELECTOR, "div[class*='well well-white'")
+    sidebars = driver.find_elements(*_css_locator("div[class*='well well-white']"))
+    xml_link, publi_date = None, None
 
     for sidebar in sidebars:
         key_ = isolate_css_selector(sidebar)
 
         if key_ == 'Alle Fassungen':
             # get current version
-            active_sub = sidebar.find_element(By.CSS_SELECTOR, 'span[class*="soft-green"]')
+            active_sub = sidebar.find_element(*_css_locator('span[class*="soft-green"]'))
             
             # get parent
             active_parent = get_parent(active_sub, 2)
@@ -113,9 +163,101 @@ def get_xml_link(driver, date=True):
     else: 
         return xml_link
 
+class FedlexDriver:
+    """
+    Headless Chrome that stays open across Fedlex pages, so the browser 
+    startup is only paid once.
+
+    Can be used as a context manager, the browser is started on enter 
+    and quit on exit.
+
+    Parameters:
+    clear_cookies (bool): If True, deletes all cookies before loading a page (default is False).
+    """
+    def __init__(self, clear_cookies=False):
+        self.clear_cookies = clear_cookies
+        self.driver = None
+
+    def start(self):
+        if self.driver is None:
+            options = webdriver.ChromeOptions() 
+            options.add_argument("--headless") 
+            options.page_load_strategy = "none"
+
+            self.driver = Chrome(options=options) 
+        return self
+
+    def quit(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.quit()
+
+    def isolate_legal_xml(self, url, date=False):
+        """
+        Isolate legal XML link and publication date from a given URL.
+
+        Parameters:
+        url (str): The URL to scrape for legal XML link and publication date.
+        date (bool): If True, returns the publication date along with the XML link (default is False).
+
+        Returns:
+        tuple or str: A tuple containing the XML link and publication date if date is True,
+        otherwise just the XML link.
+        """
+        driver = self.start().driver
+        if self.clear_cookies:
+            driver.delete_all_cookies()
+        previous_status = driver.find_elements(*_css_locator("app-in-force-status"))
+        driver.get(url)
+        wait = WebDriverWait(driver, 3)
+        if previous_status:
+            # get returns before the new document is loaded (page load strategy 
+            # none), the status bar of the previous page must be gone first
+            wait.until(EC.staleness_of(previous_status[0]))
+        # the status bar is rendered last, once it is there the lookups below do 
+        # not need to wait (no implicit wait is set on the driver)
+        wait.until(EC.presence_of_element_located(_css_locator("app-in-force-status")))
+        
+        legal_status = detect_inforce(driver=driver)
+        if legal_status == 'in_force':
+            if date:
+                xml_link, publi_date = get_xml_link(driver=driver, date=date)
+                current_uri = driver.current_url
+                return xml_link, legal_status, publi_date, current_uri
+            else:
+                xml_link = get_xml_link(driver=driver, date=date)
+                current_uri = driver.current_url
+                return xml_link, legal_status, current_uri
+        else: 
+            current_uri = driver.current_url
+            return url, legal_status, current_uri
+
+def _init_driver():
+    """
+    Start the FedlexDriver of the current process, used as pool initializer.
+
+    The browser is quit by a multiprocessing finalizer when the process exits,
+    which covers the main process as well as pool workers that are joined.
+    Forked workers inherit the driver of their parent, they start their own 
+    browser instead of sharing its session.
+    """
+    global _DRIVER, _DRIVER_PID
+    if _DRIVER is None or _DRIVER_PID != os.getpid():
+        _DRIVER = FedlexDriver().start()
+        _DRIVER_PID = os.getpid()
+        multiprocessing.util.Finalize(_DRIVER, _DRIVER.quit, exitpriority=10)
+    return _DRIVER
+
 def isolate_legal_xml(url, date=False):
     """
-    Isolate legal XML link and publication date from a given URL.
+    Isolate legal XML link and publication date from a given URL, using the
+    browser shared by all calls of the current process.
 
     Parameters:
     url (str): The URL to scrape for legal XML link and publication date.
@@ -125,27 +267,146 @@ def isolate_legal_xml(url, date=False):
     tuple or str: A tuple containing the XML link and publication date if date is True,
     otherwise just the XML link.
     """
-    options = webdriver.ChromeOptions() 
-    options.add_argument("--headless") 
-    options.page_load_strategy = "none"
+    return _init_driver().isolate_legal_xml(url, date=date)
 
-    driver = Chrome(options=options) 
-    driver.implicitly_wait(3)
+def _parse_legal_page(content, url, current_uri, date=False):
+    """
+    Isolate the legal XML link from the plain html of a Fedlex page.
 
-    driver.get(url)
-    
-    legal_status = detect_inforce(driver=driver)
-    if legal_status == 'in_force':
-        if date:
-            xml_link, publi_date = get_xml_link(driver=driver, date=date)
-            current_uri = driver.current_url
-            driver.close()
-            return xml_link, legal_status, publi_date, current_uri
-        else:
-            xml_link = get_xml_link(driver=driver, date=date)
-            current_uri = driver.current_url
-            driver.close()
-            return xml_link, legal_status, current_uri
-    else: 
-        current_uri = driver.current_url
+    Parameters:
+    content (bytes): The html of the page as returned by the server.
+    url (str): The requested URL.
+    current_uri (str): The URL after following redirects.
+    date (bool): If True, also returns the publication date (default is False).
+
+    Returns:
+    tuple or None: The same tuple as isolate_legal_xml, or None if the page 
+    content is only rendered by JavaScript.
+    """
+    root = lxml.html.fromstring(content)
+    status_text = _XP_INFORCE_TEXT(root).strip()
+    if not status_text:
+        return None
+
+    legal_status = _legal_status(status_text)
+    if legal_status != 'in_force':
         return url, legal_status, current_uri
+
+    xml_link, publi_date = None, None
+    for sidebar in _XP_WELL_WHITE(root):
+        titles = _XP_H4(sidebar)
+        if not titles or titles[0].text_content().strip() != 'Alle Fassungen':
+            continue
+        for active_sub in _XP_ACTIVE(sidebar)[:1]:
+            active_parent = active_sub.getparent().getparent()
+            for data_element in _XP_TD(active_parent):
+                cell_text = data_element.text_content().strip()
+                if _TWO_DIGITS_RE.search(cell_text):
+                    publi_date = cell_text
+                for link_element in _XP_A_HREF(data_element):
+                    if link_element.text_content().strip() == 'XML':
+                        xml_link = urljoin(current_uri, link_element.get('href'))
+    if xml_link is None:
+        return None
+
+    if date:
+        return xml_link, legal_status, publi_date, current_uri
+    return xml_link, legal_status, current_uri
+
+async def aisolate_legal_xml(url, client, date=False):
+    """
+    Isolate legal XML link from a given URL without rendering the page.
+
+    Parameters:
+    url (str): The URL to scrape for legal XML link and publication date.
+    client (httpx.AsyncClient): The client used to fetch the page.
+    date (bool): If True, returns the publication date along with the XML link (default is False).
+
+    Returns:
+    tuple or None: The same tuple as isolate_legal_xml, or None if the page
+    requires JavaScript or could not be fetched.
+    """
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    try:
+        return _parse_legal_page(response.content, url, str(response.url), date=date)
+    except etree.ParserError:
+        # empty body, the page goes to the browser fallback like unrendered ones
+        return None
+
+async def _aisolate_many(urls, concurrency=32, date=False):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(http2=True, follow_redirects=True, timeout=30) as client:
+        async def _bounded(url):
+            async with semaphore:
+                return url, await aisolate_legal_xml(url, client, date=date)
+        return dict(await asyncio.gather(*[_bounded(url) for url in urls]))
+
+def isolate_legal_xml_batch(urls, concurrency=32, processes=8):
+    """
+    Isolate legal XML links for several URLs, fetching the plain html 
+    concurrently and rendering only the pages that require JavaScript.
+
+    Parameters:
+    urls (list): The URLs to scrape for legal XML links.
+    concurrency (int): Maximal number of simultaneous requests (default is 32).
+    processes (int): Number of browser processes for the fallback (default is 8).
+
+    Returns:
+    dict: Mapping of each URL to the result of isolate_legal_xml, or None 
+    if the XML link could not be isolated.
+    """
+    if not urls:
+        return {}
+    results = asyncio.run(_aisolate_many(urls, concurrency=concurrency))
+    missing = [url for url, isolated in results.items() if isolated is None]
+    if missing and USE_BROWSER_FALLBACK:
+        results.update(isolate_legal_xml_many(missing, processes=processes))
+    return results
+
+def _isolate_worker(url):
+    """
+    Pool worker around isolate_legal_xml, keeps the url next to its result
+    as imap_unordered does not preserve the order of the input.
+    """
+    try:
+        isolated = isolate_legal_xml(url)
+    except (NoSuchElementException, TimeoutException):
+        return url, None
+    except Exception as e:
+        # an error must not escape imap_unordered, the pool would be terminated 
+        # without quitting the browsers and the whole batch would be lost
+        _LOGGER.error(f'Error isolating the XML link of {url}, {e}')
+        return url, None
+    if isolated[0] is None:
+        # in force, but the versions sidebar was not rendered in time
+        return url, None
+    return url, isolated
+
+def isolate_legal_xml_many(urls, processes=8, chunksize=4):
+    """
+    Isolate legal XML links for several URLs using a pool of browser processes.
+
+    Selenium drivers are not thread-safe, so every worker process holds its own
+    headless Chrome that is reused for all URLs dispatched to it.
+
+    Parameters:
+    urls (list): The URLs to scrape for legal XML links.
+    processes (int): Number of worker processes, i.e. browsers (default is 8).
+    chunksize (int): Number of URLs sent to a worker at once (default is 4).
+
+    Returns:
+    dict: Mapping of each URL to the result of isolate_legal_xml, or None 
+    if the page did not contain the expected elements.
+    """
+    results = {}
+    with multiprocessing.Pool(processes=processes, initializer=_init_driver) as pool:
+        for url, isolated in pool.imap_unordered(_isolate_worker, urls, chunksize=chunksize):
+            results[url] = isolated
+        # close and join instead of terminate, so the workers quit their browsers
+        pool.close()
+        pool.join()
+    return results
@@ -5,53 +5,150 @@ This module provides functions to query SPARQL endpoints, particularly the
 Fedlex endpoint, and extract relevant legal entries and citation details.
 
 Functions:
-    extract_entries(sparql_query)
+    extract_entries(sparql_response)
     fetch_full_fedlex(sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint')
     fetch_cited_by_art(article_uri, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint')
     fetch_citing_art(article_uri, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint')
+    fetch_cited_by_art_batch(article_uris, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint', batch_size=100)
+    fetch_citing_art_batch(article_uris, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint', batch_size=100)
+    fetch_many_cited(article_uris, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint', workers=16)
+    fetch_many_citing(article_uris, sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint', workers=16)
+    walk_citation_graph(seed_uris, depth, direction='cited_by', sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint', workers=16)
 
 Dependencies:
-    - re
-    - SPARQLWrapper2
+    - requests
+    - ijson
 
 Usage:
     from src.legal.sparqlqueries import extract_entries, fetch_full_fedlex, fetch_cited_by_art, fetch_citing_art
 """
 
-import re
-from SPARQLWrapper import SPARQLWrapper2
+import copy
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_entries(sparql_query):
+import ijson
+import requests
+from requests.adapters import HTTPAdapter
+
+# citation lookups are repeated for the same uris during graph expansion
+_CACHE_SIZE = 8192
+
+# sessions are not shared across threads, each thread keeps its own pool
+_LOCAL = threading.local()
+
+# query templates, the article uris are filled into the VALUES clause with 
+# str.format, hence the doubled braces around the graph patterns
+_CITED_BY_TPL = """
+    PREFIX jolux: <http://data.legilux.public.lu/resource/ontology/jolux#>
+    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+ 
+    SELECT DISTINCT ?article_uri ?abbreviation ?id_cited ?title_cited ?article_cited ?uri_citation_loc (?Zitiertes_Gesetz AS ?cited_law_uri) WHERE {{
+        VALUES ?article_uri {{ {uris} }}
+
+        ?Consolidation jolux:isMemberOf ?article_uri . 
+        ?Subdivision jolux:legalResourceSubdivisionIsPartOf ?Consolidation .
+        
+        ?uri_citation_loc jolux:citationFromLegalResource ?Subdivision . 
+        ?uri_citation_loc jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
+        
+        ?uri_citation_loc jolux:citationToLegalResource/jolux:legalResourceSubdivisionIsPartOf ?Zitiertes_Gesetz .
+        ?Zitiertes_Gesetz rdf:type jolux:ConsolidationAbstract .
+        
+        ?Zitiertes_Gesetz jolux:isRealizedBy ?Expression . # Wähle alle Expressions (Sprachausgaben)
+        ?Expression jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
+        ?Expression jolux:title ?title_cited ;
+                    jolux:titleShort ?abbreviation ;
+                    jolux:historicalLegalId ?id_cited .
+                    
+        OPTIONAL {{ ?uri_citation_loc jolux:descriptionFrom ?article_cited . }}
+        
+        ?Zitiertes_Gesetz jolux:dateEntryInForce ?datumInKraft .
+        FILTER( ( xsd:date(?datumInKraft) <= xsd:date(now()) ) )
+        OPTIONAL {{ ?Zitiertes_Gesetz jolux:dateNoLongerInForce ?datumAufhebung . }}
+        FILTER( !bound(?datumAufhebung) || xsd:date(?datumAufhebung) >= xsd:date(now()) )
+        }} 
     """
-    Extracts and cleans entries from a SPARQL query result.
+
+_CITING_TPL = """
+    PREFIX jolux: <http://data.legilux.public.lu/resource/ontology/jolux#>
+    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+ 
+    SELECT DISTINCT ?article_uri ?abbreviation ?citing_id ?citing_title ?citing_article ?citing_uri (?Zitierendes_Gesetz AS ?citing_law_uri) WHERE {{
+        VALUES ?article_uri {{ {uris} }}
+
+        ?Subdivision jolux:legalResourceSubdivisionIsPartOf ?article_uri . 
+        
+        ?citing_uri jolux:citationToLegalResource ?Subdivision . 
+        ?citing_uri jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
+        
+        ?citing_uri jolux:citationFromLegalResource/jolux:legalResourceSubdivisionIsPartOf/jolux:isMemberOf ?Zitierendes_Gesetz .
+        
+        ?Zitierendes_Gesetz jolux:classifiedByTaxonomyEntry ?TaxonomyEntry ; # Wähle alle TaxonomyEntries
+                            jolux:isRealizedBy ?Expression . # Wähle alle Expressions (Sprachausgaben)
+        ?TaxonomyEntry skos:notation ?citing_id .
+        ?Expression jolux:language <http://publications.europa.eu/resource/authority/language/DEU> ;
+                    jolux:titleShort ?abbreviation ;
+                    jolux:title ?citing_title .
+                    
+        OPTIONAL {{ ?citing_uri jolux:descriptionFrom ?citing_article . }}
+        
+        ?Zitierendes_Gesetz jolux:dateEntryInForce ?datumInKraft .
+        FILTER( ( xsd:date(?datumInKraft) <= xsd:date(now()) ) )
+        OPTIONAL {{ ?Zitierendes_Gesetz jolux:dateNoLongerInForce ?datumAufhebung . }}
+        FILTER( !bound(?datumAufhebung) || xsd:date(?datumAufhebung) >= xsd:date(now()) )
+    }}
+    """
+
+def extract_entries(sparql_response):
+    """
+    Extracts and cleans entries from a SPARQL JSON result while it is read.
 
     Parameters
     ----------
-    sparql_query : SPARQLWrapper.QueryResult
-        The SPARQL query result object from which to extract and clean entries.
+    sparql_response : file-like
+        The raw SPARQL JSON result stream, e.g. the HTTP response of the query.
 
     Returns
     -------
-    list of dict
-        A list of dictionaries, each containing cleaned entries from the SPARQL query result.
+    generator of dict
+        A dictionary per binding, containing the cleaned values of the SPARQL query result.
 
     Example
     -------
-    >>> result = sparql.query()
-    >>> cleaned_data = extract_entries(result)
+    >>> response = requests.post(sparql_ep, data={'query': query}, stream=True)
+    >>> cleaned_data = list(extract_entries(response.raw))
     """
-    parsed_queryset = []
-    full_set = sparql_query[sparql_query.variables]
-    for entry in full_set:
-        sub_set = {}
-        for key_, val_ in entry.items():
-            val_raw = val_.value
-            val_raw = re.sub('\xa0', '', val_raw)
-            sub_set[key_] = val_raw
+    bindings = ijson.items(sparql_response, 'results.bindings.item')
+    return ({key_: val_['value'].replace('\xa0', '') for key_, val_ in entry.items()}
+            for entry in bindings)
 
-        parsed_queryset.append(sub_set)
+def _session():
+    """
+    Returns the requests.Session of the current thread, which keeps the 
+    connections to the endpoint alive across queries.
+    """
+    session = getattr(_LOCAL, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept'] = 'application/sparql-results+json'
+        _LOCAL.session = session
+    return session
 
-    return parsed_queryset
+def _run_query(fetch_string, sparql_ep):
+    """
+    Runs a query against the endpoint and returns the cleaned entries, the
+    result is parsed incrementally from the response instead of being loaded first.
+    """
+    with _session().post(sparql_ep, data={'query': fetch_string}, stream=True) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return list(extract_entries(response.raw))
 
 def fetch_full_fedlex(sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint'):
     """
@@ -66,18 +163,19 @@ def fetch_full_fedlex(sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint'):
     -------
     list of dict
         A list of dictionaries containing the complete set of legal entries from the Fedlex SPARQL endpoint.
+        Entries with an XML manifestation of their current consolidation contain its 
+        link under 'xml_manifestation'.
 
     Example
     -------
     >>> entries = fetch_full_fedlex()
     """
-    fetcher = SPARQLWrapper2(sparql_ep)
     fetch_string = """
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
     PREFIX jolux: <http://data.legilux.public.lu/resource/ontology/jolux#>
     PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
 
-    SELECT DISTINCT ?sr_number ?titel ?abbreviation ?sr_uri WHERE {
+    SELECT DISTINCT ?sr_number ?titel ?abbreviation ?sr_uri ?datumInKraft ?date_applicability ?xml_manifestation WHERE {
         ?sr_uri rdf:type jolux:ConsolidationAbstract .
         ?sr_uri jolux:classifiedByTaxonomyEntry ?TaxonomyEntry ;
                 jolux:isRealizedBy ?Expression .
@@ -93,13 +191,42 @@ def fetch_full_fedlex(sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint'):
         FILTER( ( xsd:date(?datumInKraft) <= xsd:date(now()) ) )
         OPTIONAL { ?sr_uri jolux:dateNoLongerInForce ?datumAufhebung . }
         FILTER( !bound(?datumAufhebung) || xsd:date(?datumAufhebung) >= xsd:date(now()) )
+
+        # every applicable consolidation, the XML only binds where that 
+        # consolidation has one, so the latest one is found regardless of format
+        OPTIONAL {
+            ?Consolidation jolux:isMemberOf ?sr_uri ;
+                           jolux:dateApplicability ?date_applicability .
+            FILTER( xsd:date(?date_applicability) <= xsd:date(now()) )
+            OPTIONAL {
+                ?Consolidation jolux:isRealizedBy ?ConsolidationExpression .
+                ?ConsolidationExpression jolux:language <http://publications.europa.eu/resource/authority/language/DEU> ;
+                                         jolux:isEmbodiedBy ?Manifestation .
+                ?Manifestation jolux:userFormat <https://fedlex.data.admin.ch/vocabulary/user-format/xml> ;
+                               jolux:isExemplifiedBy ?xml_manifestation .
+            }
+        }
     }
     """
-    fetcher.setQuery(fetch_string)
-    returner = fetcher.query()
-    extracted = extract_entries(returner)
+    extracted = _run_query(fetch_string, sparql_ep)
 
-    return extracted
+    return _latest_consolidation(extracted)
+
+def _latest_consolidation(entries):
+    """
+    Keeps one entry per legal text, carrying the XML link of the latest 
+    applicable consolidation if the triple store has one. If the latest
+    consolidation has no XML, the entry has no link, so the text is resolved
+    from its page instead of taking an outdated consolidation.
+    """
+    latest = {}
+    for entry in entries:
+        # on the same date, a row with the XML link wins over one without
+        rank = (entry.pop('date_applicability', ''), 'xml_manifestation' in entry)
+        key_ = tuple(sorted((k, v) for k, v in entry.items() if k != 'xml_manifestation'))
+        if key_ not in latest or rank > latest[key_][0]:
+            latest[key_] = (rank, entry)
+    return [entry for _, entry in latest.values()]
 
 def fetch_cited_by_art(article_uri, 
                        sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint'):
@@ -122,44 +249,12 @@ def fetch_cited_by_art(article_uri,
     -------
     >>> cited_articles = fetch_cited_by_art('http://example.org/article/123')
     """
-    fetcher = SPARQLWrapper2(sparql_ep)
-    raw_string = """
-    PREFIX jolux: <http://data.legilux.public.lu/resource/ontology/jolux#>
-    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
- 
-    SELECT DISTINCT ?abbreviation ?id_cited ?title_cited ?article_cited ?uri_citation_loc WHERE {
-    
-        ?Consolidation jolux:isMemberOf <__REPLACER__> . 
-        ?Subdivision jolux:legalResourceSubdivisionIsPartOf ?Consolidation .
-        
-        ?uri_citation_loc jolux:citationFromLegalResource ?Subdivision . 
-        ?uri_citation_loc jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
-        
-        ?uri_citation_loc jolux:citationToLegalResource/jolux:legalResourceSubdivisionIsPartOf ?Zitiertes_Gesetz .
-        ?Zitiertes_Gesetz rdf:type jolux:ConsolidationAbstract .
-        
-        ?Zitiertes_Gesetz jolux:isRealizedBy ?Expression . # Wähle alle Expressions (Sprachausgaben)
-        ?Expression jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
-        ?Expression jolux:title ?title_cited ;
-                    jolux:titleShort ?abbreviation ;
-                    jolux:historicalLegalId ?id_cited .
-                    
-        OPTIONAL { ?uri_citation_loc jolux:descriptionFrom ?article_cited . }
-        
-        ?Zitiertes_Gesetz jolux:dateEntryInForce ?datumInKraft .
-        FILTER( ( xsd:date(?datumInKraft) <= xsd:date(now()) ) )
-        OPTIONAL { ?Zitiertes_Gesetz jolux:dateNoLongerInForce ?datumAufhebung . }
-        FILTER( !bound(?datumAufhebung) || xsd:date(?datumAufhebung) >= xsd:date(now()) )
-        } 
-    """
-    fetch_string = re.sub('__REPLACER__', article_uri, raw_string)
+    # copy, the cached entries would otherwise be mutable by the caller
+    return copy.deepcopy(_query_cited_by_art(article_uri, sparql_ep))
 
-    fetcher.setQuery(fetch_string)
-    returner = fetcher.query()
-    extracted = extract_entries(returner)
-
-    return extracted
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _query_cited_by_art(article_uri, sparql_ep):
+    return _query_batch(_CITED_BY_TPL, [article_uri], sparql_ep)[article_uri]
 
 def fetch_citing_art(article_uri, 
                      sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint'):
@@ -182,38 +277,195 @@ def fetch_citing_art(article_uri,
     -------
     >>> citing_articles = fetch_citing_art('http://example.org/article/123')
     """
-    fetcher = SPARQLWrapper2(sparql_ep)
-    raw_string = """
-    PREFIX jolux: <http://data.legilux.public.lu/resource/ontology/jolux#>
-    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
- 
-    SELECT DISTINCT ?abbreviation ?citing_id ?citing_title ?citing_article ?citing_uri WHERE {
-        ?Subdivision jolux:legalResourceSubdivisionIsPartOf <__REPLACER__> . 
-        
-        ?citing_uri jolux:citationToLegalResource ?Subdivision . 
-        ?citing_uri jolux:language <http://publications.europa.eu/resource/authority/language/DEU> .
-        
-        ?citing_uri jolux:citationFromLegalResource/jolux:legalResourceSubdivisionIsPartOf/jolux:isMemberOf ?Zitierendes_Gesetz .
-        
-        ?Zitierendes_Gesetz jolux:classifiedByTaxonomyEntry ?TaxonomyEntry ; # Wähle alle TaxonomyEntries
-                            jolux:isRealizedBy ?Expression . # Wähle alle Expressions (Sprachausgaben)
-        ?TaxonomyEntry skos:notation ?citing_id .
-        ?Expression jolux:language <http://publications.europa.eu/resource/authority/language/DEU> ;
-                    jolux:titleShort ?abbreviation ;
-                    jolux:title ?citing_title .
-                    
-        OPTIONAL { ?citing_uri jolux:descriptionFrom ?citing_article . }
-        
-        ?Zitierendes_Gesetz jolux:dateEntryInForce ?datumInKraft .
-        FILTER( ( xsd:date(?datumInKraft) <= xsd:date(now()) ) )
-        OPTIONAL { ?Zitierendes_Gesetz jolux:dateNoLongerInForce ?datumAufhebung . }
-        FILTER( !bound(?datumAufhebung) || xsd:date(?datumAufhebung) >= xsd:date(now()) )
-    }
+    return copy.deepcopy(_query_citing_art(article_uri, sparql_ep))
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _query_citing_art(article_uri, sparql_ep):
+    return _query_batch(_CITING_TPL, [article_uri], sparql_ep)[article_uri]
+
+def _query_batch(template, article_uris, sparql_ep, batch_size=100):
+    """
+    Runs a citation template for many uris, `batch_size` uris per query, and
+    groups the entries by the uri they belong to.
+    """
+    unique_uris = list(dict.fromkeys(article_uris))
+    grouped = {uri: [] for uri in unique_uris}
+    for start in range(0, len(unique_uris), batch_size):
+        values = ' '.join(f'<{uri}>' for uri in unique_uris[start:start + batch_size])
+        for entry in _run_query(template.format(uris=values), sparql_ep):
+            grouped.setdefault(entry.pop('article_uri'), []).append(entry)
+    return grouped
+
+def fetch_cited_by_art_batch(article_uris,
+                             sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint',
+                             batch_size=100):
+    """
+    Fetches the articles cited by each of the given article URIs, grouping 
+    `batch_size` URIs into one query with a VALUES clause.
+
+    Parameters
+    ----------
+    article_uris : iterable of str
+        The URIs of the articles for which to find cited articles.
+    sparql_ep : str, optional
+        The URL of the SPARQL endpoint to query. Default is 'https://fedlex.data.admin.ch/sparqlendpoint'.
+    batch_size : int, optional
+        The number of URIs per query. Default is 100.
+
+    Returns
+    -------
+    dict of list of dict
+        A dictionary mapping each article URI to the entries fetch_cited_by_art returns for it.
+
+    Example
+    -------
+    >>> cited_articles = fetch_cited_by_art_batch(['http://example.org/article/123'])
+    """
+    return _query_batch(_CITED_BY_TPL, article_uris, sparql_ep, batch_size=batch_size)
+
+def fetch_citing_art_batch(article_uris,
+                           sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint',
+                           batch_size=100):
     """
-    fetch_string = re.sub('__REPLACER__', article_uri, raw_string)
-    
-    fetcher.setQuery(fetch_string)
-    returner = fetcher.query()
-    extracted = extract_entries(returner)
+    Fetches the articles citing each of the given article URIs, grouping 
+    `batch_size` URIs into one query with a VALUES clause.
+
+    Parameters
+    ----------
+    article_uris : iterable of str
+        The URIs of the articles for which to find citing articles.
+    sparql_ep : str, optional
+        The URL of the SPARQL endpoint to query. Default is 'https://fedlex.data.admin.ch/sparqlendpoint'.
+    batch_size : int, optional
+        The number of URIs per query. Default is 100.
+
+    Returns
+    -------
+    dict of list of dict
+        A dictionary mapping each article URI to the entries fetch_citing_art returns for it.
+
+    Example
+    -------
+    >>> citing_articles = fetch_citing_art_batch(['http://example.org/article/123'])
+    """
+    return _query_batch(_CITING_TPL, article_uris, sparql_ep, batch_size=batch_size)
+
+def _fetch_many(fetch_function, article_uris, sparql_ep, workers):
+    # duplicates are dropped, the results are shared through the cache anyway
+    unique_uris = list(dict.fromkeys(article_uris))
+    fetch_uri = functools.partial(fetch_function, sparql_ep=sparql_ep)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(unique_uris, executor.map(fetch_uri, unique_uris)))
+
+def fetch_many_cited(article_uris,
+                     sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint',
+                     workers=16):
+    """
+    Fetches the articles cited by each of the given article URIs, with the 
+    queries running concurrently.
+
+    Parameters
+    ----------
+    article_uris : iterable of str
+        The URIs of the articles for which to find cited articles.
+    sparql_ep : str, optional
+        The URL of the SPARQL endpoint to query. Default is 'https://fedlex.data.admin.ch/sparqlendpoint'.
+    workers : int, optional
+        The number of queries running at the same time. Default is 16.
+
+    Returns
+    -------
+    dict of list of dict
+        A dictionary mapping each article URI to the result of fetch_cited_by_art.
+
+    Example
+    -------
+    >>> cited_articles = fetch_many_cited(['http://example.org/article/123'])
+    """
+    return _fetch_many(fetch_cited_by_art, article_uris, sparql_ep, workers)
+
+def fetch_many_citing(article_uris,
+                      sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint',
+                      workers=16):
+    """
+    Fetches the articles citing each of the given article URIs, with the 
+    queries running concurrently.
+
+    Parameters
+    ----------
+    article_uris : iterable of str
+        The URIs of the articles for which to find citing articles.
+    sparql_ep : str, optional
+        The URL of the SPARQL endpoint to query. Default is 'https://fedlex.data.admin.ch/sparqlendpoint'.
+    workers : int, optional
+        The number of queries running at the same time. Default is 16.
+
+    Returns
+    -------
+    dict of list of dict
+        A dictionary mapping each article URI to the result of fetch_citing_art.
+
+    Example
+    -------
+    >>> citing_articles = fetch_many_citing(['http://example.org/article/123'])
+    """
+    return _fetch_many(fetch_citing_art, article_uris, sparql_ep, workers)
+
+def walk_citation_graph(seed_uris,
+                        depth,
+                        direction='cited_by',
+                        sparql_ep='https://fedlex.data.admin.ch/sparqlendpoint',
+                        workers=16):
+    """
+    Expands the citation graph level by level from the given seed URIs.
+
+    Every legal text is queried at most once, texts already visited are not
+    scheduled again, which matters as citation graphs are densely cyclic.
+
+    Parameters
+    ----------
+    seed_uris : iterable of str
+        The URIs of the legal texts to start from.
+    depth : int
+        The number of levels to query, 1 only queries the seeds.
+    direction : str, optional
+        'cited_by' follows the texts cited by a text, 'citing' the texts citing it. 
+        Default is 'cited_by'.
+    sparql_ep : str, optional
+        The URL of the SPARQL endpoint to query. Default is 'https://fedlex.data.admin.ch/sparqlendpoint'.
+    workers : int, optional
+        The number of queries running at the same time. Default is 16.
+
+    Returns
+    -------
+    dict of list of dict
+        A dictionary mapping each visited URI to its citation entries.
+
+    Example
+    -------
+    >>> graph = walk_citation_graph(['https://fedlex.data.admin.ch/eli/cc/1962/1364_1409_1420'], depth=2)
+    """
+    if direction == 'cited_by':
+        fetch_function, neighbour_key = fetch_cited_by_art, 'cited_law_uri'
+    elif direction == 'citing':
+        fetch_function, neighbour_key = fetch_citing_art, 'citing_law_uri'
+    else:
+        raise ValueError(f"direction must be 'cited_by' or 'citing', got {direction!r}")
+
+    fetch_uri = functools.partial(fetch_function, sparql_ep=sparql_ep)
+    citation_graph = {}
+    visited = set()
+    wave = list(dict.fromkeys(seed_uris))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(depth):
+            visited.update(wave)
+            neighbours = set()
+            for uri, entries in zip(wave, executor.map(fetch_uri, wave)):
+                citation_graph[uri] = entries
+                neighbours.update(entry[neighbour_key] for entry in entries if neighbour_key in entry)
+            wave = list(neighbours - visited)
+            if not wave:
+                break
 
-    return extracted
+    return citation_graph
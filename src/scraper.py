@@ -3,28 +3,99 @@ Combiner module for the scraper, contains two classes, one for crawling FEDRO co
 and the other to crawl fedlex (slightly more efficiently), as there is a SPARQL endpoint
 hosted by the confederation that contains additional information.
 """
+import asyncio
+import functools
 import logging
 import os
 import pickle
-import time
-from typing import Optional, List, Dict, Callable
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, List, Dict, Callable, Collection
 
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hashlib
 import urllib
+from urllib.robotparser import RobotFileParser
 
 import re
 from bs4 import BeautifulSoup
 import lxml
-from selenium.common import NoSuchElementException
 
 from typing import Optional, Callable
 
-from .utils.adminlink import isolate_simple
-from .utils.adminlink import detect_javascript
-from .legal.helpers import isolate_legal_xml
-from .legal.sparqlqueries import fetch_full_fedlex, fetch_citing_art, fetch_cited_by_art
-from .utils.schemas import fedro_filetypes, fedro_filesplit
+from .utils.adminlink import scan_html, guess_encoding
+from .legal.helpers import isolate_legal_xml, isolate_legal_xml_batch
+from .legal.sparqlqueries import fetch_full_fedlex, fetch_citing_art_batch, fetch_cited_by_art_batch
+from .utils.schemas import fedro_filetype_substrings, fedro_filesplit
+
+_RE_NAME = re.compile(r'([^\/]+$)')
+_RE_TYPE = re.compile(r'([^\.]+$)')
+
+_DEFAULT_WHITELIST = ('classified-compilation', 'fedlex', 'astra/de')
+
+# statuses of an overloaded server, retried with a backoff instead of stored
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+_RETRY_BACKOFF = 2.0
+# downloads other than html are hashed and written in chunks of this size
+_CHUNK_SIZE = 1 << 16
+
+
+@functools.lru_cache(maxsize=None)
+def _whitelist_pattern(whitelist: tuple) -> re.Pattern:
+    """
+    Compiles a whitelist into one alternation, matched in a single scan per link.
+    """
+    return re.compile('|'.join(map(re.escape, whitelist)))
+
+
+def _make_session() -> requests.Session:
+    """
+    Creates a requests.Session that keeps connections alive and retries 
+    failed requests with a backoff.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16,
+                          pool_maxsize=64,
+                          max_retries=Retry(total=3, backoff_factor=0.5))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _make_connector(limit_per_host: int = 4) -> aiohttp.TCPConnector:
+    """
+    Creates the aiohttp connector shared by the requests of one crawl, host
+    resolutions are cached so only the first request to a host pays for the
+    DNS lookup. On the requests side, the pooled keep-alive connections of
+    _make_session serve the same purpose.
+    """
+    return aiohttp.TCPConnector(limit=100,
+                                limit_per_host=limit_per_host,
+                                use_dns_cache=True,
+                                ttl_dns_cache=600)
+
+
+class _HostLimiter:
+    """
+    Spaces the requests to one host at least `interval` seconds apart. Only used
+    from the event loop, so the slots are handed out without a lock.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        now = asyncio.get_running_loop().time()
+        delay = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
 
 class PageScraper:
@@ -38,7 +109,7 @@ class PageScraper:
         A predefined list of file types to recognize, by default None.
     predefined_filesplit : Optional[dict], optional
         A predefined dictionary specifying where to store different file types, by default None.
-    predefined_links : Optional[dict], optional
+    predefined_links : Optional[list], optional
         A predefined list of links to be crawled, by default None.
     predefined_done_links : Optional[list], optional
         A predefined list of links that have already been crawled, by default None.
@@ -47,36 +118,45 @@ class PageScraper:
 
     Attributes
     ----------
-    defined_filetypes : list
-        List of recognized file types for the scraper.
+    defined_filetypes : frozenset
+        Set of recognized file types for the scraper.
     write_split : dict
         Dictionary specifying file storage locations based on type.
-    link_dict : list
-        List of links to be crawled.
-    done_links : list
-        List of links that have already been crawled.
+    link_dict : set
+        Set of all links found so far.
+    todo_links : collections.deque
+        Links still to be crawled, popped first in first out (breadth-first).
+    done_links : set
+        Set of links that have already been crawled.
     knowledge_base : dict
         Dictionary to store information about crawled pages.
     legalfile_iterator : int
         Counter for naming legal files uniquely.
     logger : logging.Logger
         Logger for the scraper operations.
+    session : requests.Session
+        Session with connection pooling used for the synchronous requests.
     """
 
     def __init__(self,
                  predefined_filetypes: Optional[list] = None, 
                  predefined_filesplit: Optional[dict] = None,
-                 predefined_links: Optional[dict] = None,
+                 predefined_links: Optional[list] = None,
                  predefined_done_links: Optional[list] = None,
                  predefined_knowledge: Optional[dict] = None) -> None:
         self.logger = logging.getLogger('scraper')
         self.logger.info('scraper instantiated')
+        self.session = _make_session()
+        self._whitelist_re = _whitelist_pattern(_DEFAULT_WHITELIST)
         
         if predefined_filetypes is not None:
-            self.defined_filetypes = predefined_filetypes
+            filetypes = predefined_filetypes
             self.logger.info('Using custom filetypes')
         else:
-            self.defined_filetypes = fedro_filetypes
+            filetypes = fedro_filetype_substrings
+        # the set answers the exact lookups, the tuple keeps the order for substring matches
+        self.defined_filetypes = frozenset(filetypes)
+        self._filetype_substrings = tuple(filetypes)
         
         if predefined_filesplit is not None:
             self.write_split = predefined_filesplit
@@ -85,18 +165,21 @@ class PageScraper:
             self.write_split = fedro_filesplit
 
         if predefined_links is not None:
-            self.link_dict = predefined_links
-            self.todo_links = predefined_links
+            self.link_dict = set(predefined_links)
+            self.todo_links = deque(predefined_links)
             self.logger.info('Using predefined set of links')
 
         else:
-            self.link_dict = []
+            self.link_dict = set()
+            self.todo_links = deque()
 
+        # the seen links stay in exact sets rather than a Bloom filter, to_dict,
+        # from_dict and resumed crawls need every link back
         if predefined_done_links is not None:
-            self.done_links = predefined_done_links
+            self.done_links = set(predefined_done_links)
             self.logger.info('Using predefined set of done links')
         else:
-            self.done_links = []
+            self.done_links = set()
         
         if predefined_knowledge is not None:
             self.knowledge_base = predefined_knowledge
@@ -105,6 +188,100 @@ class PageScraper:
             self.knowledge_base = {}
 
         self.legalfile_iterator = 0
+        # append-only log of the knowledge base, opened while crawling
+        self._knowledge_log = None
+        # robots.txt and request pacing per host, kept for one crawl
+        self._robots = {}
+        self._limiters = {}
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        # open file handles and pending tasks can not be pickled
+        state['_knowledge_log'] = None
+        state['_robots'] = {}
+        state['_limiters'] = {}
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        state.setdefault('_knowledge_log', None)
+        state.setdefault('_robots', {})
+        state.setdefault('_limiters', {})
+        if '_filetype_substrings' not in state:
+            # scrapers pickled before the file types were kept as a set
+            state['_filetype_substrings'] = tuple(state['defined_filetypes'])
+            state['defined_filetypes'] = frozenset(state['defined_filetypes'])
+        self.__dict__.update(state)
+
+    @staticmethod
+    def load_knowledge_base(write_dir: str) -> Dict:
+        """
+        Reads the knowledge base back from the log written during the crawl, later
+        records of a url replace earlier ones.
+
+        Parameters
+        ----------
+        write_dir : str
+            Directory the crawled pages were saved to.
+
+        Returns
+        -------
+        dict
+            The knowledge base, keyed by url.
+        """
+        knowledge_base = {}
+        with open(os.path.join(write_dir, '_overview', 'knowledge_base.jsonl'), 'rb') as con:
+            for line in con:
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                knowledge_base[record.pop('url')] = record
+        return knowledge_base
+
+    def to_dict(self) -> Dict:
+        """
+        Exports the data fields of the scraper as plain, serializable types.
+
+        Returns
+        -------
+        dict
+            Dictionary of the filetypes, filesplit, links and knowledge base.
+        """
+        return {
+            'defined_filetypes': list(self._filetype_substrings),
+            'write_split': dict(self.write_split),
+            'link_dict': list(self.link_dict),
+            'todo_links': list(getattr(self, 'todo_links', [])),
+            'done_links': list(self.done_links),
+            'knowledge_base': self.knowledge_base,
+            'legalfile_iterator': self.legalfile_iterator,
+            'write_dir': getattr(self, 'write_dir', None),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PageScraper':
+        """
+        Restores a scraper from the output of to_dict.
+
+        Parameters
+        ----------
+        data : dict
+            Dictionary as returned by to_dict.
+
+        Returns
+        -------
+        PageScraper
+            Scraper that can continue the crawl.
+        """
+        scraper = cls(predefined_filetypes=data['defined_filetypes'],
+                      predefined_filesplit=data['write_split'],
+                      predefined_links=data['link_dict'],
+                      predefined_done_links=data['done_links'],
+                      predefined_knowledge=data['knowledge_base'])
+        scraper.todo_links = deque(data['todo_links'])
+        scraper.legalfile_iterator = data['legalfile_iterator']
+        if data['write_dir'] is not None:
+            scraper.write_dir = data['write_dir']
+        return scraper
 
     def crawl_page(self,
                    write_dir: str,
@@ -114,10 +291,18 @@ class PageScraper:
                    replicate_pagestruct: Optional[bool] = False,
                    verbose: Optional[bool] = True,
                    retries: Optional[int] = 1,
+                   concurrency: Optional[int] = 50,
+                   rate_limit: Optional[float] = 10.0,
+                   respect_robots: Optional[bool] = True,
+                   store_filetypes: Optional[Collection[str]] = None,
                    **kwargs) -> None:
         """
         Crawls the web page starting from the initial URL and processes the links found.
 
+        Pages are downloaded concurrently in waves of at most `concurrency` URLs, 
+        the links found in a wave are crawled in the following waves. The requests
+        to each host are paced, and pages disallowed by its robots.txt are skipped.
+
         Parameters
         ----------
         write_dir : str
@@ -133,7 +318,19 @@ class PageScraper:
         verbose : bool, optional
             If True, print progress information to the console, by default True.
         retries : int, optional
-            Number of retries if HTTP requests fail, by default 1.
+            Number of retries if HTTP requests fail, retried with an exponential 
+            backoff, by default 1.
+        concurrency : int, optional
+            Maximal number of simultaneous requests, by default 50.
+        rate_limit : float, optional
+            Maximal number of requests per second to one host, a larger crawl delay 
+            in the robots.txt of the host takes precedence, by default 10.0.
+        respect_robots : bool, optional
+            Whether to skip the pages disallowed by the robots.txt of their host, 
+            by default True.
+        store_filetypes : Collection[str], optional
+            File types to store, html pages are always downloaded for their links 
+            and other types are not downloaded at all, by default None (all types).
         kwargs : dict
             Additional keyword arguments for page processing.
 
@@ -144,58 +341,362 @@ class PageScraper:
         self.write_dir = write_dir
         if write:
             self._verify_filestructure(write_dir)
+            self._knowledge_log = open(os.path.join(write_dir, '_overview', 'knowledge_base.jsonl'), 'ab')
+
+        try:
+            asyncio.run(self._crawl_async(initial_url=initial_url,
+                                          domain_url=domain_url,
+                                          write=write,
+                                          verbose=verbose,
+                                          retries=retries,
+                                          concurrency=concurrency,
+                                          rate_limit=rate_limit,
+                                          respect_robots=respect_robots,
+                                          store_filetypes=store_filetypes,
+                                          **kwargs))
+        finally:
+            if self._knowledge_log is not None:
+                self._knowledge_log.close()
+                self._knowledge_log = None
+
+    async def _crawl_async(self,
+                           initial_url: str,
+                           domain_url: str,
+                           write: bool,
+                           verbose: bool,
+                           retries: int,
+                           concurrency: int,
+                           rate_limit: float,
+                           respect_robots: bool,
+                           store_filetypes: Optional[Collection[str]],
+                           **kwargs) -> None:
+        """
+        Event loop part of crawl_page, drains the todo links in waves.
 
-        if len(self.link_dict) == 0:
-            self._process_page(url=initial_url, 
-                               write_status=write, 
-                               verbose=verbose, 
-                               **kwargs)
-            
-        while len(self.todo_links) > 0:
-            current_try = 0
-            current_url = next(iter(self.todo_links))
-            # print(current_url)
-
-            if self._verify_linkparent(current_url):
-
-                if not domain_url in current_url and not 'classified-compilation' in current_url and not 'fedlex' in current_url:
-                    pull_url = domain_url + current_url
-                else:
-                    pull_url = current_url
-
-                try:
-                    self._process_page(url=pull_url, 
-                                    write_status=write, 
-                                    verbose=verbose, 
-                                    **kwargs)
-                except:
-                    current_try += 1
-                    if current_try >= retries:
-                        time.sleep(5)
-                        self._process_page(url=pull_url, 
-                                        write_status=write, 
-                                        verbose=verbose, 
-                                        **kwargs)
-            self._pop_item(current_url)
-            
-
-    def _process_page(self, 
-                      url: str, 
-                      write_status: bool, 
-                      verbose: bool, 
-                      **kwargs) -> None:
+        The html of the downloaded pages is scanned for links in a process pool,
+        so parsing scales with the cores. The results are handled by a single 
+        worker thread, writing does not block the downloads while the crawl state 
+        is only ever modified by one thread.
         """
-        Processes a single web page by fetching its content, identifying its type, 
-        and storing the content appropriately.
+        semaphore = asyncio.Semaphore(concurrency)
+        connector = _make_connector()
+        self._robots = {}
+        self._limiters = {}
+
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as parse_pool, \
+                ThreadPoolExecutor(max_workers=1) as handler:
+            async with aiohttp.ClientSession(connector=connector) as session:
+                process = functools.partial(self._a_process_page,
+                                            session,
+                                            semaphore,
+                                            parse_pool,
+                                            handler,
+                                            write_status=write,
+                                            verbose=verbose,
+                                            retries=retries,
+                                            rate_limit=rate_limit,
+                                            respect_robots=respect_robots,
+                                            store_filetypes=store_filetypes,
+                                            **kwargs)
+
+                if len(self.link_dict) == 0:
+                    await process(initial_url)
+
+                while len(self.todo_links) > 0:
+                    wave = [self.todo_links.popleft() 
+                            for _ in range(min(concurrency, len(self.todo_links)))]
+                    pull_urls = []
+                    for current_url in wave:
+                        if self._verify_linkparent(current_url):
+                            if not domain_url in current_url and not 'classified-compilation' in current_url and not 'fedlex' in current_url:
+                                pull_urls.append(domain_url + current_url)
+                            else:
+                                pull_urls.append(current_url)
+
+                    await asyncio.gather(*[process(pull_url) for pull_url in pull_urls])
+
+                    for current_url in wave:
+                        self._pop_item(current_url)
+
+    async def _a_process_page(self,
+                              session: aiohttp.ClientSession,
+                              semaphore: asyncio.Semaphore,
+                              parse_pool: ProcessPoolExecutor,
+                              handler: ThreadPoolExecutor,
+                              url: str,
+                              write_status: bool,
+                              verbose: bool,
+                              retries: int = 1,
+                              rate_limit: float = 10.0,
+                              respect_robots: bool = True,
+                              store_filetypes: Optional[Collection[str]] = None,
+                              **kwargs) -> None:
+        """
+        Downloads a single web page and hands its content to the handler thread.
 
         Parameters
         ----------
+        session : aiohttp.ClientSession
+            Session shared by all downloads of the crawl.
+        semaphore : asyncio.Semaphore
+            Bounds the number of simultaneous downloads.
+        parse_pool : ProcessPoolExecutor
+            Process pool scanning the html pages for links.
+        handler : ThreadPoolExecutor
+            Single worker executor processing the downloaded content.
         url : str
             URL of the page to process.
         write_status : bool
             Whether the page content should be saved to disk.
         verbose : bool
             If True, print progress information to the console.
+        retries : int, optional
+            Number of retries if the page fails, by default 1.
+        rate_limit : float, optional
+            Maximal number of requests per second to the host, by default 10.0.
+        respect_robots : bool, optional
+            Whether to skip the page if the robots.txt disallows it, by default True.
+        store_filetypes : Collection[str], optional
+            File types to store, by default None (all types).
+        kwargs : dict
+            Additional keyword arguments for HTML processing.
+
+        Returns
+        -------
+        None
+        """
+        # a bad link is logged and skipped, it must not abort the gather of the wave
+        try:
+            download_mode = self._download_mode(url, store_filetypes)
+            if download_mode == 'skip':
+                return
+            file_type, file_name = self._get_filenames(url)
+            # only html is kept in memory for parsing, everything else is streamed
+            stream_path = None
+            if file_type != 'html' and self._stores(file_type, write_status, store_filetypes):
+                stream_path = self._storage_path(file_type, file_name)
+
+            split_url = urllib.parse.urlsplit(url)
+            host_url = f'{split_url.scheme}://{split_url.netloc}'
+
+            interval = 1 / rate_limit
+            if respect_robots:
+                if host_url not in self._robots:
+                    # concurrent pages of a new host wait for the same download
+                    self._robots[host_url] = asyncio.ensure_future(self._fetch_robots(session, host_url))
+                robots = await self._robots[host_url]
+                if not robots.can_fetch('*', url):
+                    self.logger.info(f'Skipping {url}, disallowed by robots.txt')
+                    return
+                interval = max(interval, robots.crawl_delay('*') or 0)
+
+            if host_url not in self._limiters:
+                self._limiters[host_url] = _HostLimiter(interval)
+            limiter = self._limiters[host_url]
+        except Exception as e:
+            self.logger.error(f'Error with page {url}, {e}')
+            return
+
+        loop = asyncio.get_running_loop()
+
+        for current_try in range(retries + 1):
+            try:
+                await limiter.wait()
+                async with semaphore:
+                    if download_mode == 'head':
+                        async with session.head(url, allow_redirects=True) as response:
+                            content_type = response.headers.get('Content-Type', '')
+                        if not self._is_html(url, content_type):
+                            return
+                        # the url did not tell, the page is handled as html from here
+                        download_mode = 'get'
+                        file_type = 'html'
+                    async with session.get(url) as response:
+                        if response.status in _RETRY_STATUSES:
+                            response.raise_for_status()
+                        if file_type == 'html':
+                            content = await response.read()
+                            header_charset = response.charset
+                        else:
+                            hex_hash = await self._a_stream_to_file(response, stream_path)
+                if file_type != 'html':
+                    await loop.run_in_executor(handler, functools.partial(self._handle_streamed,
+                                                                          url=url,
+                                                                          file_type=file_type,
+                                                                          file_name=file_name,
+                                                                          hex_hash=hex_hash,
+                                                                          verbose=verbose))
+                    return
+                # the parsing is cpu bound, scan_html is picklable as a module level function
+                encoding = guess_encoding(content, header_charset)
+                scan = await loop.run_in_executor(parse_pool, functools.partial(scan_html,
+                                                                                [content],
+                                                                                encoding=encoding))
+                await loop.run_in_executor(handler, functools.partial(self._handle_content,
+                                                                      url=url,
+                                                                      content=content,
+                                                                      file_type=file_type,
+                                                                      scan=scan,
+                                                                      write_status=write_status,
+                                                                      verbose=verbose,
+                                                                      store_filetypes=store_filetypes,
+                                                                      **kwargs))
+                return
+            except Exception as e:
+                if current_try >= retries:
+                    self.logger.error(f'Error with page {url}, {e}')
+                    return
+                await asyncio.sleep(_RETRY_BACKOFF * 2 ** current_try)
+
+    async def _a_stream_to_file(self,
+                                response: aiohttp.ClientResponse,
+                                write_path: Optional[str]) -> str:
+        """
+        Hashes the body of a response chunk by chunk and writes the chunks to disk, 
+        so no more than one chunk per download is held in memory.
+
+        Parameters
+        ----------
+        response : aiohttp.ClientResponse
+            Response whose body has not been read yet.
+        write_path : str, optional
+            Where to write the body, None to only hash it.
+
+        Returns
+        -------
+        str
+            The BLAKE2b hash value (16 byte digest) of the body.
+        """
+        loop = asyncio.get_running_loop()
+        hash_object = hashlib.blake2b(digest_size=16)
+        con = None
+        if write_path is not None:
+            con = await loop.run_in_executor(None, open, write_path, 'wb')
+        try:
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                hash_object.update(chunk)
+                if con is not None:
+                    await loop.run_in_executor(None, con.write, chunk)
+        finally:
+            if con is not None:
+                con.close()
+        return hash_object.hexdigest()
+
+    async def _fetch_robots(self,
+                            session: aiohttp.ClientSession,
+                            host_url: str) -> RobotFileParser:
+        """
+        Downloads and parses the robots.txt of a host. A missing or unreachable
+        robots.txt allows everything, as with RobotFileParser.read.
+
+        Parameters
+        ----------
+        session : aiohttp.ClientSession
+            Session shared by all downloads of the crawl.
+        host_url : str
+            Scheme and host, e.g. 'https://www.astra.admin.ch'.
+
+        Returns
+        -------
+        RobotFileParser
+            The parsed rules of the host.
+        """
+        robots = RobotFileParser(f'{host_url}/robots.txt')
+        lines = []
+        try:
+            async with session.get(robots.url) as response:
+                if response.status in (401, 403):
+                    robots.disallow_all = True
+                elif response.status < 400:
+                    lines = (await response.text(errors='replace')).splitlines()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f'Error fetching {robots.url}, {e}')
+        robots.parse(lines)
+        return robots
+
+    def _download_mode(self,
+                       url: str,
+                       store_filetypes: Optional[Collection[str]]) -> str:
+        """
+        Decides from the url whether a page needs to be downloaded.
+
+        Parameters
+        ----------
+        url : str
+            URL of the page.
+        store_filetypes : Collection[str], optional
+            File types to store, None for all types.
+
+        Returns
+        -------
+        str
+            'get' to download the page, 'skip' for a file type that is not stored
+            and 'head' if the url does not tell the type, so the content type 
+            has to be probed first.
+        """
+        if store_filetypes is None:
+            return 'get'
+        file_type, _ = self._get_filenames(url)
+        if file_type == 'html' or file_type in store_filetypes:
+            return 'get'
+        if file_type == 'else':
+            return 'head'
+        return 'skip'
+
+    @staticmethod
+    def _stores(file_type: str,
+                write_status: bool,
+                store_filetypes: Optional[Collection[str]]) -> bool:
+        """
+        Whether a page of the given file type is written to disk.
+        """
+        return write_status and (store_filetypes is None or file_type in store_filetypes)
+
+    def _storage_path(self, file_type: str, file_name: str) -> str:
+        """
+        Path a page of the given file type and name is stored at.
+        """
+        return os.path.join(self.write_dir, self.write_split[file_type], file_name)
+
+    def _is_html(self, url: str, content_type: str) -> bool:
+        """
+        Checks the content type of a probed page, anything but html is not downloaded.
+        """
+        if 'html' in content_type:
+            return True
+        self.logger.info(f'Skipping {url}, content type {content_type or "unknown"} is not stored')
+        return False
+
+    def _handle_content(self,
+                        url: str,
+                        content: bytes,
+                        write_status: bool,
+                        verbose: bool,
+                        file_type: Optional[str] = None,
+                        scan: Optional[tuple] = None,
+                        store_filetypes: Optional[Collection[str]] = None,
+                        **kwargs) -> None:
+        """
+        Identifies the type of downloaded content and stores it appropriately.
+
+        Parameters
+        ----------
+        url : str
+            URL the content was downloaded from.
+        content : bytes
+            The body of the response.
+        write_status : bool
+            Whether the page content should be saved to disk.
+        verbose : bool
+            If True, print progress information to the console.
+        file_type : str, optional
+            The type of the content if it is known from its content type, by 
+            default None (taken from the url).
+        scan : tuple, optional
+            The links and javascript flag of an html page if already scanned, 
+            by default None.
+        store_filetypes : Collection[str], optional
+            File types to store, by default None (all types).
         kwargs : dict
             Additional keyword arguments for HTML processing.
 
@@ -203,44 +704,84 @@ class PageScraper:
         -------
         None
         """
-        as_pickle = False
-        crawl_object = requests.get(url)
-        file_type, file_name = self._get_filenames(url)
+        url_type, file_name = self._get_filenames(url)
+        if file_type is None:
+            file_type = url_type
 
         if file_type in ['html']:
-            as_pickle = True
-            crawl_object, file_type, file_name, linked_docs = self._process_html(url=url, 
-                                                                                 crawl_object=crawl_object,
-                                                                                 file_name=file_name, 
-                                                                                 **kwargs)
+            file_type, file_name, linked_docs, content, page_flags = self._process_html(url=url, 
+                                                                                        content=content,
+                                                                                        file_name=file_name, 
+                                                                                        scan=scan,
+                                                                                        **kwargs)
         else:
             linked_docs = []
+            page_flags = None
 
-        hash_value = self._hash_file(crawl_object)
+        # the fetched bytes are hashed and stored as they are, no tree is built
+        hash_value = self._hash_file(content)
+        # html pages of types that are not stored are only downloaded for their links
+        write_status = self._stores(file_type, write_status, store_filetypes)
         self._store_object(url=url, 
-                           object=crawl_object, 
+                           object=content, 
                            file_name=file_name, 
                            file_type=file_type,
                            hex_hash=hash_value, 
                            neighbour_list=linked_docs, 
                            write=write_status, 
-                           as_pickle=as_pickle)
+                           page_flags=page_flags)
 
         if verbose:
             print(f'processed: {url}')
 
+    def _handle_streamed(self,
+                         url: str,
+                         file_type: str,
+                         file_name: str,
+                         hex_hash: str,
+                         verbose: bool) -> None:
+        """
+        Records a download that was hashed, and written if needed, while streaming.
+
+        Parameters
+        ----------
+        url : str
+            URL the content was downloaded from.
+        file_type : str
+            The type of the file.
+        file_name : str
+            The name of the file.
+        hex_hash : str
+            The hash value of the content.
+        verbose : bool
+            If True, print progress information to the console.
+
+        Returns
+        -------
+        None
+        """
+        self._store_object(url=url,
+                           object=None,
+                           file_name=file_name,
+                           file_type=file_type,
+                           hex_hash=hex_hash,
+                           neighbour_list=[],
+                           write=False)
+
+        if verbose:
+            print(f'processed: {url}')
 
     def _gather_links(self,
-                      soup_obj: BeautifulSoup,
+                      hrefs: List[str],
                       filter_function: Optional[Callable] = None,
                       filter_string: Optional[str] = None) -> List[str]:
         """
-        Gathers links from the BeautifulSoup object and filters them using the given function or string.
+        Gathers the links found on a page and filters them using the given function or string.
 
         Parameters
         ----------
-        soup_obj : BeautifulSoup
-            The BeautifulSoup object to gather links from.
+        hrefs : List[str]
+            The links found on the page.
         filter_function : Optional[Callable], optional
             A function to filter URLs, by default None.
         filter_string : Optional[str], optional
@@ -251,22 +792,14 @@ class PageScraper:
         List[str]
             A list of gathered links.
         """
-        new_list = isolate_simple(soup_obj,
-                                  filter_function=filter_function,
-                                  search_string=filter_string)
-
-        if self.link_dict:
-            set_new = set(new_list)
-            set_existing = set(self.link_dict)
+        new_list = [href for href in hrefs 
+                    if filter_function is None or filter_function(href, search_string=filter_string)]
 
-            crawl_new = list(set_new - set_existing)
-            self.todo_links = crawl_new + self.todo_links
-            self.todo_links = list(set(self.todo_links) - set(self.done_links))
+        # one set of the page links, both differences run in C
+        crawl_new = set(new_list).difference(self.link_dict, self.done_links)
 
-            self.link_dict = self.link_dict + crawl_new
-        else:
-            self.link_dict = new_list
-            self.todo_links = new_list
+        self.todo_links.extend(crawl_new)
+        self.link_dict |= crawl_new
 
         return new_list
 
@@ -285,15 +818,12 @@ class PageScraper:
         tuple
             A tuple containing the file type and file name.
         """
-        extract_name = re.compile(r'([^\/]+$)')
-        extract_type = re.compile(r'([^\.]+$)')
-
         decoded_string = urllib.parse.unquote(url)
-        file_name = re.search(extract_name, decoded_string)[0]
-        file_type = re.search(extract_type, file_name.lower())[0]
+        file_name = _RE_NAME.search(decoded_string)[0]
+        file_type = _RE_TYPE.search(file_name.lower())[0]
 
         if not file_type in self.defined_filetypes:
-            for file_t in self.defined_filetypes:
+            for file_t in self._filetype_substrings:
                 if file_t in file_type:
                     file_type = file_t
                     return file_type, file_name
@@ -304,9 +834,10 @@ class PageScraper:
         
     def _process_html(self,
                       url: str,
-                      crawl_object: requests.Response,
+                      content: bytes,
                       file_name: str,
-                      **kwargs) -> (BeautifulSoup, str, str, List[str]):
+                      scan: Optional[tuple] = None,
+                      **kwargs) -> (str, str, List[str], bytes, Dict):
         """
         Processes an HTML page, identifies any JavaScript, and fetches linked documents.
 
@@ -314,71 +845,60 @@ class PageScraper:
         ----------
         url : str
             The URL of the page to process.
-        crawl_object : requests.Response
-            The response object containing the page content.
+        content : bytes
+            The html content of the page.
         file_name : str
             The name of the file to save.
+        scan : tuple, optional
+            The result of scan_html on the content if it was already computed, 
+            by default None.
         kwargs : dict
             Additional keyword arguments for link gathering.
 
         Returns
         -------
         tuple
-            A tuple containing the parsed BeautifulSoup object, file type, file name, and a list of linked documents.
+            A tuple containing the file type, file name, a list of linked documents,
+            the raw content to store (the legal XML for javascript pages) and the 
+            flags of the page for the knowledge base.
         """
-        soup = BeautifulSoup(crawl_object.content, 'html.parser')
-        is_javascript = detect_javascript(soup)
+        # links and javascript detection are streamed, no tree is needed for them
+        if scan is None:
+            scan = scan_html([content], encoding=guess_encoding(content))
+        hrefs, is_javascript = scan
+        legal_status = None
         current_uri = None
         
         if is_javascript:
-            # print('is_java')
+            file_extension = 'html'
             try:
                 new_page, legal_status, current_uri = isolate_legal_xml(url)
-                crawl_object = requests.get(new_page)
-                soup = BeautifulSoup(crawl_object.content, 'xml')
+                # only texts in force come with an XML link, otherwise the page 
+                # itself was returned and its bytes are already here
+                if legal_status == 'in_force' and new_page is not None:
+                    content = self.session.get(new_page, timeout=30).content
+                    file_extension = 'xml'
             except Exception as e:
                 self.logger.error(f'Error with file {url}, {e}')
                 legal_status = 'else'
 
-            file_name = f'crawled_legaldoc_{self.legalfile_iterator}'
+            file_name = f'crawled_legaldoc_{self.legalfile_iterator}.{file_extension}'
             self.legalfile_iterator += 1
             if current_uri is not None:
                 linked_docs = current_uri
             else:
                 linked_docs = []
             current_uri = None
-            if legal_status == 'in_force':
+            if file_extension == 'xml':
                 file_type = 'legal_xml'
             else:
                 file_type = 'else'
         else:
             file_type = 'html'
-            linked_docs = self._gather_links(soup, **kwargs)
-        
-        parsed_data = self._parse_site(soup, file_type)
-        
-        return parsed_data, file_type, file_name, linked_docs
-    
-    def _parse_site(self, 
-                    soup_obj: BeautifulSoup, 
-                    file_type: str) -> BeautifulSoup:
-        """
-        Parses a site and returns the BeautifulSoup object.
+            linked_docs = self._gather_links(hrefs, **kwargs)
 
-        Parameters
-        ----------
-        soup_obj : BeautifulSoup
-            The BeautifulSoup object to parse.
-        file_type : str
-            The type of file to parse.
-
-        Returns
-        -------
-        BeautifulSoup
-            The parsed BeautifulSoup object.
-        """
-        return soup_obj
-    
+        page_flags = {'is_javascript': is_javascript, 'legal_status': legal_status}
+        return file_type, file_name, linked_docs, content, page_flags
 
     def _hash_file(self, response_object) -> str:
         """
@@ -386,18 +906,17 @@ class PageScraper:
 
         Parameters
         ----------
-        response_object : requests.Response or BeautifulSoup
-            The response object to hash.
+        response_object : bytes
+            The raw response content to hash.
 
         Returns
         -------
         str
-            The MD5 hash value of the response object.
+            The BLAKE2b hash value (16 byte digest) of the response object.
         """
-        if isinstance(response_object, requests.models.Response):
-            hash_object = hashlib.md5(response_object.content).hexdigest()
-        elif isinstance(response_object, BeautifulSoup):
-            hash_object = hashlib.md5(response_object.text.encode('utf-8')).hexdigest()
+        # only used to recognise changed content, not for security
+        if isinstance(response_object, bytes):
+            hash_object = hashlib.blake2b(response_object, digest_size=16).hexdigest()
         else:
             print('issue found')
             hash_object = '__error__'
@@ -411,7 +930,7 @@ class PageScraper:
                       hex_hash: str,
                       neighbour_list: List[str],
                       write: bool = False,
-                      as_pickle: bool = False) -> None:
+                      page_flags: Optional[Dict] = None) -> None:
         """
         Stores the object to the specified location on disk and updates the knowledge base.
 
@@ -419,8 +938,8 @@ class PageScraper:
         ----------
         url : str
             The URL of the page.
-        object : requests.Response or BeautifulSoup
-            The object to store.
+        object : bytes
+            The raw content to store.
         file_name : str
             The name of the file to save.
         file_type : str
@@ -431,34 +950,30 @@ class PageScraper:
             List of linked documents.
         write : bool, optional
             Whether to write the object to disk, by default False.
-        as_pickle : bool, optional
-            Whether to save the object as a pickle file, by default False.
+        page_flags : dict, optional
+            Flags detected on an html page, e.g. whether it needs javascript, added
+            to the knowledge base entry, by default None.
 
         Returns
         -------
         None
         """
-        write_end_split = self.write_split[file_type]
-        write_path = os.path.join(self.write_dir, write_end_split, file_name)
+        write_path = self._storage_path(file_type, file_name)
 
         self.knowledge_base[url] = {
             'storage_location': write_path,
             'file_hash': hex_hash,
             'neighbour_list': neighbour_list
         }
+        if page_flags is not None:
+            # pages are stored raw, what was detected while parsing is kept here
+            self.knowledge_base[url].update(page_flags)
+        if self._knowledge_log is not None:
+            self._knowledge_log.write(orjson.dumps({'url': url, **self.knowledge_base[url]}) + b'\n')
 
         if write:
-            if not as_pickle:
-                with open(write_path, 'wb') as con:
-                    con.write(object.content)
-            else:
-                if '.html' in write_path:
-                    comp_name = re.compile(r'(\.html)')
-                    write_path = re.sub(comp_name, '.pkl', write_path)
-                else:
-                    write_path += '.pkl'
-                with open(write_path, 'wb') as con:
-                    pickle.dump(object, con)
+            with open(write_path, 'wb') as con:
+                con.write(object)
 
     def _verify_filestructure(self, write_dir: str) -> None:
         """
@@ -473,54 +988,42 @@ class PageScraper:
         -------
         None
         """
-        if len(os.listdir(write_dir)) == 0:
-            self.logger.info('creating filestructure')
-            for file_type in list(set(self.write_split.values())):
-                os.mkdir(os.path.join(write_dir, file_type))
-            os.mkdir(os.path.join(write_dir, '_overview'))
-        elif set(list(set(self.write_split.values()))) - set(os.listdir(write_dir)) == {}:
-            self.logger.info('filestructure exists continue')
-        else:
-            self.logger.info('incomplete filestructure, adding necessary files')
-            for file_type in list(set(self.write_split.values())):
-                if not os.path.exists(os.path.join(write_dir, file_type)):
-                    os.mkdir(os.path.join(write_dir, file_type))
-            if not os.path.exists(os.path.join(write_dir, '_overview')):
-                os.mkdir(os.path.join(write_dir, '_overview'))
+        self.logger.info('verifying filestructure')
+        base_dir = Path(write_dir)
+        for file_type in set(self.write_split.values()) | {'_overview'}:
+            # no-op for directories that exist already
+            (base_dir / file_type).mkdir(parents=True, exist_ok=True)
 
     def _verify_linkparent(self, 
                            link: str, 
-                           whitelist: Optional[List]=['classified-compilation',
-                                                      'fedlex',
-                                                      'astra/de']) -> bool:
-        # check if it contains exeternal link
-        pass_val = False
-
-        for white_page in whitelist:
-            if white_page in link:
-                pass_val = True
+                           whitelist: Optional[List] = None) -> bool:
+        # check if it contains exeternal link, by default against the
+        # 'classified-compilation', 'fedlex' and 'astra/de' pages
+        if whitelist is None:
+            whitelist_re = self._whitelist_re
+        else:
+            whitelist_re = _whitelist_pattern(tuple(whitelist))
 
-        return pass_val
+        return bool(whitelist_re.search(link))
             
 
     def _pop_item(self, 
                   url: str,
                   writing_steps: Optional[int] = 400):
         """
-        Pop the current item from the todo links.
+        Mark the current item, already popped from the todo links, as done.
 
         Parameters:
         url (str): The URL to pop.
-        verbose (bool): If True, print a message (default is True).
+        writing_steps (int): Number of done links after which the knowledge base log is synced to disk (default is 400).
         """
-        self.done_links.append(url)
-        self.todo_links = list(set(self.todo_links)  - set(self.done_links))
-        self.link_dict = list(set(self.link_dict))
+        self.done_links.add(url)
         
         if len(self.done_links) % writing_steps == 0:
             print(len(self.done_links))
-            with open(os.path.join(self.write_dir, '_overview', 'knowledge_base.pkl'), 'wb') as con:
-                pickle.dump(self.knowledge_base, con)
+            if self._knowledge_log is not None:
+                self._knowledge_log.flush()
+                os.fsync(self._knowledge_log.fileno())
 
 
 class FedlexScraper:
@@ -529,6 +1032,7 @@ class FedlexScraper:
     of the sparql endpoint to isolate dependencies across legal articles
     """
     def __init__(self) -> None:
+        self.logger = logging.getLogger('scraper')
         # fet full set of uris
         self.full_set = fetch_full_fedlex()
         self.crawled_legal_knowledge = {}
@@ -536,51 +1040,113 @@ class FedlexScraper:
     def _scrap_feldex(self,
                       write_dir,
                       id_counter=0,
-                      reset_counter=0):
+                      reset_counter=0,
+                      processes=8,
+                      citation_batch_size=100,
+                      concurrency=20):
+        pending_entries = []
         for legal_entry in self.full_set:
             # Set up feature to restart crawling if there is an error
             # use the reset counter if necessary
             if id_counter <= reset_counter:
                 id_counter += 1
                 continue
-            print(f"Crawling {legal_entry['titel']}")
             web_string = legal_entry['sr_uri']
             web_string = re.sub('fedlex.data.admin.ch',
                                 'www.fedlex.admin.ch',
                                 web_string)
             web_string = web_string + '/de'
+            pending_entries.append((id_counter, legal_entry, web_string))
+            id_counter += 1
 
+        # the XML link is taken from the triple store where available, the
+        # remaining pages are resolved from the plain html or rendered in parallel
+        isolated_links = isolate_legal_xml_batch([entry[2] for entry in pending_entries
+                                                  if 'xml_manifestation' not in entry[1]],
+                                                 processes=processes)
+
+        # add some meta, the citations are fetched for many texts per query
+        articles_citing, articles_cited_in = {}, {}
+        sr_uris = [entry[1]['sr_uri'] for entry in pending_entries]
+        for start in range(0, len(sr_uris), citation_batch_size):
+            uri_batch = sr_uris[start:start + citation_batch_size]
             try:
-                xml_url, in_force_status, uri = isolate_legal_xml(web_string)
-            except NoSuchElementException:
-                id_counter += 1
+                articles_citing.update(fetch_citing_art_batch(uri_batch))
+            except Exception as e:
+                self.logger.error(f'Error fetching citing articles, {e}')
+            try:
+                articles_cited_in.update(fetch_cited_by_art_batch(uri_batch))
+            except Exception as e:
+                self.logger.error(f'Error fetching cited articles, {e}')
+
+        downloads = []
+        for doc_id, legal_entry, web_string in pending_entries:
+            if 'xml_manifestation' in legal_entry:
+                xml_url = legal_entry['xml_manifestation']
+            elif isolated_links.get(web_string) is None:
                 continue
+            else:
+                xml_url, in_force_status, uri = isolated_links[web_string]
 
-            crawl_object = requests.get(xml_url)
-            soup = BeautifulSoup(crawl_object.content, 'xml')
+            legal_entry['citing_article'] = articles_citing.get(legal_entry['sr_uri'], {})
 
-            # add some meta
-            try:
-                articles_citing_current = fetch_citing_art(legal_entry['sr_uri'])
-            except:
-                articles_citing_current = {}
-            try:
-                articles_cited_in_current = fetch_cited_by_art(legal_entry['sr_uri'])
-            except:
-                articles_cited_in_current = {}
+            legal_entry['cited_in_article'] = articles_cited_in.get(legal_entry['sr_uri'], {})
+            downloads.append((doc_id, legal_entry, xml_url))
 
-            legal_entry['citing_article'] = articles_citing_current
+        asyncio.run(self._scrap_feldex_async(write_dir, downloads, concurrency))
 
-            legal_entry['cited_in_article'] = articles_cited_in_current
+    async def _scrap_feldex_async(self, write_dir, downloads, concurrency=20):
+        """
+        Downloads the XML of the legal texts concurrently, parsing and
+        pickling is done in the default executor so it overlaps with the
+        downloads still in flight
 
-            # save as pickle
-            with open(f'{write_dir}/legal_doc_{id_counter}.pkl', 'wb') as con:
-                pickle.dump(soup, con)
-            
-            # add entry to knowledge base
-            self.crawled_legal_knowledge[f'legal_doc_{id_counter}.pkl'] = legal_entry
+        Parameters
+        ----------
+        write_dir : str
+            directory where the legal documents are stored
+        downloads : list
+            tuples of (doc_id, legal_entry, xml_url)
+        concurrency : int, optional
+            maximal number of simultaneous downloads, by default 20
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
 
-            id_counter += 1
+        async def _download(session, doc_id, legal_entry, xml_url):
+            try:
+                async with semaphore:
+                    print(f"Crawling {legal_entry['titel']}")
+                    async with session.get(xml_url) as response:
+                        response.raise_for_status()
+                        content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.error(f'Error downloading {xml_url}, {e}')
+                return
+
+            try:
+                await loop.run_in_executor(None, self._store_legal_doc,
+                                           write_dir, doc_id, content)
+            except Exception as e:
+                # one document that can not be parsed or written must not abort the gather
+                self.logger.error(f'Error storing {xml_url}, {e}')
+                return
+            # add entry to knowledge base
+            self.crawled_legal_knowledge[f'legal_doc_{doc_id}.pkl'] = legal_entry
+
+        timeout = aiohttp.ClientTimeout(total=30)
+        # all documents are served by the same host
+        connector = _make_connector(limit_per_host=concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            await asyncio.gather(*(_download(session, *download)
+                                   for download in downloads))
+
+    @staticmethod
+    def _store_legal_doc(write_dir, doc_id, content):
+        soup = BeautifulSoup(content, 'xml')
+        # save as pickle
+        with open(f'{write_dir}/legal_doc_{doc_id}.pkl', 'wb') as con:
+            pickle.dump(soup, con)
 
 class OverwriteError(Exception):
     """Exception raised when an attempt is made to overwrite existing data."""
@@ -16,6 +16,14 @@ Functions:
     Isolates simple URLs from a BeautifulSoup object. Allows optional filtering 
     using a custom filter function.
 
+- scan_html(chunks, catch_phrase='nur mit einem Javascript-fähigen Browser', encoding=None)
+    Streams raw HTML through lxml and returns the links and whether the catch 
+    phrase is present, without building a document tree.
+
+- guess_encoding(content, header_charset=None)
+    Chooses the encoding to parse raw HTML with, the charset of the HTTP 
+    header first, then UTF-8 if the content decodes as such.
+
 - isolate_named(soup_object, return_errors=True, filter_function=None, *args, **kwargs)
     Isolates named URLs (those with 'aria-label' attributes) from a BeautifulSoup 
     object. Returns a dictionary of URLs and optionally a list of errors for 
@@ -29,6 +37,7 @@ Dependencies:
 -------------
 - re: For regular expression operations.
 - BeautifulSoup: For parsing and navigating HTML content.
+- lxml: For streaming links out of raw HTML content.
 
 Usage:
 ------
@@ -59,6 +68,10 @@ filtered = string_filter("http://example.com/page", "example")
 
 import re
 
+from lxml import etree
+
+_RE_WS = re.compile('\n+')
+
 def detect_javascript(soup_obj, 
                         catch_phrase='nur mit einem Javascript-fähigen Browser'):
     """
@@ -75,7 +88,7 @@ def detect_javascript(soup_obj,
     bool: True if the catch phrase is found, otherwise False.
     """
     try:
-        search_string = re.sub('\n+', ' ', soup_obj.text.strip())
+        search_string = _RE_WS.sub(' ', soup_obj.text.strip())
         bool_ret =  catch_phrase in search_string
     except IndexError:
         bool_ret = False
@@ -86,16 +99,113 @@ def isolate_simple(soup_object,
                    filter_function=None, 
                    *args, 
                    **kwargs):
-    link_list = []
-    for link in soup_object.find_all('a', href=True):
-        if filter_function is None:
-            link_list.append(link['href'])
-        else:
-            if filter_function(link['href'], **kwargs):
-                link_list.append(link['href'])
-            else:
-                pass
-    return link_list
+    """
+    Isolate simple URLs from a BeautifulSoup object. For raw HTML content,
+    scan_html streams the links out of it without building the soup.
+
+    Parameters:
+    soup_object (BeautifulSoup): The BeautifulSoup object to search within.
+    filter_function (function): A function used to filter URLs (default is None).
+    *args: Variable length argument list.
+    **kwargs: Arbitrary keyword arguments passed to the filter function.
+
+    Returns:
+    list: The href of every link, in document order.
+    """
+    hrefs = [link.attrs['href'] for link in soup_object.find_all('a', href=True)]
+    if filter_function is None:
+        return hrefs
+    return [href for href in hrefs if filter_function(href, **kwargs)]
+
+
+class _LinkScanTarget:
+    """
+    lxml parser target that collects the href of every link and looks for the
+    catch phrase in the text, the events are handled as they are parsed and 
+    no tree is built.
+    """
+    def __init__(self, catch_phrase):
+        self.catch_phrase = catch_phrase
+        self.hrefs = []
+        self.is_javascript = False
+        self._tail = ''
+        self._tail_newline = False
+
+    def start(self, tag, attrib):
+        if tag == 'a' and 'href' in attrib:
+            self.hrefs.append(attrib['href'])
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        if self.is_javascript:
+            return
+        if self._tail_newline:
+            # a run of newlines continues across text events, it collapses to 
+            # the one space already in the tail
+            data = data.lstrip('\n')
+        if not data:
+            return
+        # keep the end of the previous text, the phrase can span text events
+        search_string = self._tail + _RE_WS.sub(' ', data)
+        self.is_javascript = self.catch_phrase in search_string
+        self._tail = search_string[-len(self.catch_phrase):]
+        self._tail_newline = data.endswith('\n')
+
+    def close(self):
+        return self.hrefs, self.is_javascript
+
+
+def guess_encoding(content, header_charset=None):
+    """
+    Chooses the encoding for raw HTML content the way BeautifulSoup does: a
+    charset given by the HTTP header wins, otherwise UTF-8 is tried first.
+
+    Parameters:
+    content (bytes): The HTML content.
+    header_charset (str): The charset of the Content-Type header, if any (default is None).
+
+    Returns:
+    str or None: The encoding, or None to let lxml use the charset declared
+    in the page.
+    """
+    if header_charset:
+        return header_charset
+    try:
+        content.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+
+def scan_html(chunks,
+              catch_phrase='nur mit einem Javascript-fähigen Browser',
+              encoding=None):
+    """
+    Streams raw HTML through lxml, collecting links and detecting whether 
+    the page requires JavaScript, without building a document tree.
+
+    Parameters:
+    chunks (iterable of bytes): The HTML content, e.g. the chunks of a response.
+    catch_phrase (str): The catch phrase indicating the need for JavaScript
+        (default is 'nur mit einem Javascript-fähigen Browser').
+    encoding (str): The encoding of the content, see guess_encoding, by default 
+        None, i.e. taken from the charset declared in the page.
+
+    Returns:
+    tuple: The href of every link in document order, and True if the catch 
+    phrase is found, otherwise False.
+    """
+    target = _LinkScanTarget(catch_phrase)
+    parser = etree.HTMLParser(target=target, encoding=encoding)
+    for chunk in chunks:
+        parser.feed(chunk)
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        # nothing parsable was fed
+        return target.hrefs, target.is_javascript
 
 
 def isolate_named(soup_object,
@@ -1,12 +1,15 @@
 """
 Module that contains some schemas that can be used to granularize the outputs from the crawler
 """
-fedro_filetypes = ['pdf', 'html', 
-                   'legal_xml', 'xml',
-                   'zip', 
-                   'xlsx', 'xls', 'docx', 'doc', 'dotx', 'pptx', 'ppt', 
-                   'jpg', 'png',
-                   'dxf', 'dwg', 'mpg']
+# in order of preference, a type that contains another one comes first
+fedro_filetype_substrings = ('pdf', 'html', 
+                             'legal_xml', 'xml',
+                             'zip', 
+                             'xlsx', 'xls', 'docx', 'doc', 'dotx', 'pptx', 'ppt', 
+                             'jpg', 'png',
+                             'dxf', 'dwg', 'mpg')
+
+fedro_filetypes = frozenset(fedro_filetype_substrings)
 
 fedro_filesplit = {'pdf': 'pdf',
                    'html': 'html',